@@ -0,0 +1,194 @@
+"""
+Numba 加速的遮罩式相關係數核心
+處理有上市缺口（NaN）的股票欄位：逐對剔除缺值後計算精確的
+Pearson 相關係數；未安裝 numba 時呼叫端應退回 NumPy 路徑
+"""
+
+import numpy as np
+
+try:
+    from numba import njit, prange
+    HAVE_NUMBA = True
+except ImportError:
+    HAVE_NUMBA = False
+
+
+if HAVE_NUMBA:
+
+    # fastmath 不可含 'nnan'：全開會以「無 NaN」假設最佳化，
+    # 把 a == a 的缺值檢查整個消掉，缺口欄位會錯誤地回傳 NaN
+    @njit(parallel=True, fastmath={'contract', 'reassoc', 'arcp'}, cache=True)
+    def corr_vs_target(Z, t_idx, window, min_obs):
+        """
+        計算目標欄位與所有欄位在最後 window 列內的相關係數
+
+        缺值（NaN）逐對剔除；有效樣本數不足 min_obs 的欄位回傳 NaN
+
+        Args:
+            Z: (T, n) 矩陣，缺值以 NaN 表示
+            t_idx: 目標欄位索引
+            window: 時間窗口（列數）
+            min_obs: 最低有效樣本數
+
+        Returns:
+            長度 n 的相關係數陣列
+        """
+        T, n = Z.shape
+        out = np.empty(n, dtype=np.float64)
+
+        start = T - window
+        if start < 0:
+            start = 0
+
+        for j in prange(n):
+            sxy = 0.0
+            sx = 0.0
+            sy = 0.0
+            sxx = 0.0
+            syy = 0.0
+            k = 0
+
+            for t in range(start, T):
+                a = Z[t, t_idx]
+                b = Z[t, j]
+                # NaN != NaN，自比較即為缺值檢查
+                if a == a and b == b:
+                    sxy += a * b
+                    sx += a
+                    sy += b
+                    sxx += a * a
+                    syy += b * b
+                    k += 1
+
+            if k >= min_obs:
+                cov = k * sxy - sx * sy
+                var = (k * sxx - sx * sx) * (k * syy - sy * sy)
+                out[j] = cov / np.sqrt(var) if var > 0 else np.nan
+            else:
+                out[j] = np.nan
+
+        return out
+
+    # fastmath 同樣不可含 'nnan'（見 corr_vs_target）
+    @njit(parallel=True, fastmath={'contract', 'reassoc', 'arcp'}, cache=True)
+    def corr_vs_target_multi(Z, t_idx, windows, min_obs):
+        """
+        一趟掃描同時計算多個時間窗口的相關係數
+
+        所有窗口皆對齊至矩陣尾端，由最新列往回掃一次、
+        跨過窗口邊界時結算該窗口，各欄位只讀取一遍，
+        取代逐窗口重複啟動核心與重讀資料
+
+        Args:
+            Z: (T, n) 矩陣，缺值以 NaN 表示
+            t_idx: 目標欄位索引
+            windows: 各時間窗口的列數（int64 陣列）
+            min_obs: 各窗口的最低有效樣本數（int64 陣列）
+
+        Returns:
+            (窗口數, n) 的相關係數矩陣
+        """
+        T, n = Z.shape
+        m = windows.shape[0]
+        out = np.empty((m, n), dtype=np.float64)
+
+        w_max = 0
+        for i in range(m):
+            if windows[i] > w_max:
+                w_max = windows[i]
+        scanned = min(w_max, T)
+
+        for j in prange(n):
+            sxy = 0.0
+            sx = 0.0
+            sy = 0.0
+            sxx = 0.0
+            syy = 0.0
+            k = 0
+
+            for back in range(1, scanned + 1):
+                t = T - back
+                a = Z[t, t_idx]
+                b = Z[t, j]
+                # NaN != NaN，自比較即為缺值檢查
+                if a == a and b == b:
+                    sxy += a * b
+                    sx += a
+                    sy += b
+                    sxx += a * a
+                    syy += b * b
+                    k += 1
+
+                for i in range(m):
+                    if windows[i] == back:
+                        if k >= min_obs[i]:
+                            cov = k * sxy - sx * sy
+                            var = (k * sxx - sx * sx) * (k * syy - sy * sy)
+                            out[i, j] = cov / np.sqrt(var) if var > 0 else np.nan
+                        else:
+                            out[i, j] = np.nan
+
+            # 窗口長於可用列數時，以掃過的全部列結算
+            for i in range(m):
+                if windows[i] > scanned:
+                    if k >= min_obs[i]:
+                        cov = k * sxy - sx * sy
+                        var = (k * sxx - sx * sx) * (k * syy - sy * sy)
+                        out[i, j] = cov / np.sqrt(var) if var > 0 else np.nan
+                    else:
+                        out[i, j] = np.nan
+
+        return out
+
+else:
+    corr_vs_target = None
+    corr_vs_target_multi = None
+
+
+if __name__ == "__main__":
+    # 測試：含缺值欄位的結果必須與成對剔除的參考實作一致
+    # （守住 fastmath 設定：'nnan' 一旦混入，缺口欄位會變成 NaN）
+
+    def _ref_corr(Z, t_idx, window, min_obs):
+        """純 NumPy 的成對剔除 Pearson 參考實作"""
+        T, n = Z.shape
+        start = max(T - window, 0)
+        out = np.empty(n, dtype=np.float64)
+
+        for j in range(n):
+            a = Z[start:, t_idx]
+            b = Z[start:, j]
+            valid = ~(np.isnan(a) | np.isnan(b))
+
+            if valid.sum() < min_obs:
+                out[j] = np.nan
+                continue
+
+            out[j] = np.corrcoef(a[valid], b[valid])[0, 1]
+
+        return out
+
+    if not HAVE_NUMBA:
+        print("未安裝 numba，略過核心測試")
+    else:
+        rng = np.random.default_rng(0)
+        Z = rng.normal(size=(200, 6))
+        Z[50:60, 2] = np.nan   # 窗口內有缺口的欄位
+        Z[195, 4] = np.nan     # 尾端單日缺值
+        Z[:120, 5] = np.nan    # 上市不久、有效樣本不足的欄位
+
+        got = corr_vs_target(Z, 0, 120, 84)
+        ref = _ref_corr(Z, 0, 120, 84)
+        assert np.allclose(got, ref, atol=1e-6, equal_nan=True), \
+            "corr_vs_target 與參考實作不符"
+
+        windows = np.array([120, 20, 10], dtype=np.int64)
+        min_obs = np.ceil(windows * 0.7).astype(np.int64)
+        got_multi = corr_vs_target_multi(Z, 0, windows, min_obs)
+
+        for i, window in enumerate(windows):
+            ref_i = _ref_corr(Z, 0, int(window), int(min_obs[i]))
+            assert np.allclose(got_multi[i], ref_i, atol=1e-6, equal_nan=True), \
+                f"corr_vs_target_multi 窗口 {window} 與參考實作不符"
+
+        print("✓ 缺值欄位的相關係數與參考實作一致")
@@ -3,11 +3,110 @@
 計算股票之間的相關係數並進行排序
 """
 
+import os
+
+# 讓 BLAS 的矩陣運算使用所有核心（需在 numpy 載入前設定才會生效）
+os.environ.setdefault('OPENBLAS_NUM_THREADS', str(os.cpu_count() or 1))
+
 import pandas as pd
 import numpy as np
+from functools import lru_cache
 from typing import List, Dict, Tuple, Optional
 import yfinance as yf
 from database import StockDatabase
+from _numba_corr import HAVE_NUMBA, corr_vs_target_multi
+
+# numexpr 可將逐元素運算融合為單趟掃描，減半記憶體流量；未安裝時退回 NumPy
+try:
+    import numexpr as ne
+    HAVE_NUMEXPR = True
+except ImportError:
+    HAVE_NUMEXPR = False
+
+# 相關係數強度的分界與標籤（供純量與向量化格式化共用）
+_STRENGTH_BINS = np.array([0.3, 0.5, 0.7, 0.9])
+_STRENGTH_LABELS = np.array(["極弱", "弱", "中等", "強", "極強"])
+
+
+@lru_cache(maxsize=4096)
+def _strength_text(corr: float) -> str:
+    """
+    依相關係數產生強度描述字串（以捨入後的值為鍵做記憶化）
+
+    Args:
+        corr: 捨入至四位小數的相關係數
+
+    Returns:
+        強度描述字串
+    """
+    level = int(np.digitize(abs(corr), _STRENGTH_BINS))
+    direction = "正相關" if corr >= 0 else "負相關"
+
+    return f"{_STRENGTH_LABELS[level]}{direction}"
+
+
+def compute_correlation_sql(
+    db: StockDatabase,
+    symbol1: str,
+    symbol2: str,
+    windows: Tuple[int, ...] = (120, 60, 20)
+) -> Dict[int, float]:
+    """
+    直接在 SQLite 中計算兩檔股票的相關係數
+
+    Σx、Σy、Σxy、Σx²、Σy² 五個總和由 SQL 引擎的 C 迴圈彙總，
+    Python 端每個窗口只取回六個純量再套用
+    c = (kΣxy − ΣxΣy) / √((kΣx² − (Σx)²)(kΣy² − (Σy)²))，
+    免去把整段時間序列拉進 pandas 的成本
+
+    Args:
+        db: 資料庫實例
+        symbol1: 第一檔股票代碼（完整代碼）
+        symbol2: 第二檔股票代碼（完整代碼）
+        windows: 時間窗口列表（天數）
+
+    Returns:
+        {窗口天數: 相關係數} 字典（資料不足時為 NaN）
+    """
+    results = {}
+
+    for window in windows:
+        # 取兩檔股票共同交易日中第 window 新的日期作為窗口起點
+        cutoff_row = db.conn.execute("""
+            SELECT date FROM stock_prices WHERE symbol = ?
+            INTERSECT
+            SELECT date FROM stock_prices WHERE symbol = ?
+            ORDER BY date DESC
+            LIMIT 1 OFFSET ?
+        """, (symbol1, symbol2, window - 1)).fetchone()
+
+        # 共同交易日不足一個窗口時，從最早的共同日期算起
+        cutoff = cutoff_row[0] if cutoff_row else ''
+
+        k, sx, sy, sxy, sxx, syy = db.conn.execute("""
+            SELECT COUNT(*),
+                   SUM(p1.close_price),
+                   SUM(p2.close_price),
+                   SUM(p1.close_price * p2.close_price),
+                   SUM(p1.close_price * p1.close_price),
+                   SUM(p2.close_price * p2.close_price)
+            FROM stock_prices p1
+            JOIN stock_prices p2 ON p1.date = p2.date
+            WHERE p1.symbol = ? AND p2.symbol = ? AND p1.date >= ?
+        """, (symbol1, symbol2, cutoff)).fetchone()
+
+        # 共同交易日不足 70% 視為資料不足
+        if k < window * 0.7:
+            results[window] = float('nan')
+            continue
+
+        denom = (k * sxx - sx * sx) * (k * syy - sy * sy)
+        if denom > 0:
+            results[window] = (k * sxy - sx * sy) / np.sqrt(denom)
+        else:
+            results[window] = float('nan')
+
+    return results
 
 
 class CorrelationEngine:
@@ -24,53 +123,79 @@ class CorrelationEngine:
         self.db = db
         self.updater = updater
 
+        # 一次載入已知的股票代碼集合，避免每次解析都查詢資料庫
+        self._known_symbols = set(self.db.get_all_symbols())
+        # 解析結果快取：同一批計算會重複解析相同的代碼
+        self._symbol_cache: Dict[str, str] = {}
+        # 批次搜尋結果快取：以資料庫最新交易日為鍵的一部分，
+        # 收盤後資料不再變動，同一標的重複查詢直接回用；
+        # 新資料寫入後最新日期改變，舊鍵自然失效
+        self._search_cache: Dict[Tuple[str, int, str], List[Dict]] = {}
+        # 兩檔相關係數快取：鍵為排序後的代碼對＋資料庫最新交易日，
+        # 相關係數與查詢順序無關，反向查詢也能命中
+        self._pair_cache: Dict[Tuple[str, str, str], Dict[int, float]] = {}
+
     def get_full_symbol(self, symbol: str) -> Optional[str]:
         """
         取得完整的股票代碼（自動加上 .TW 或 .TWO 後綴）
 
+        解析結果會被快取，已知代碼直接以集合查詢命中，
+        只有真正未知的代碼才會觸發資料庫或 yfinance 查詢
+
         Args:
             symbol: 股票代碼（可能有或沒有後綴）
 
         Returns:
             完整的股票代碼，如果找不到則返回 None
         """
-        # 如果已經有後綴，先檢查資料庫中是否有資料
+        cached = self._symbol_cache.get(symbol)
+        if cached is not None:
+            return cached
+
+        resolved = self._resolve_full_symbol(symbol)
+        if resolved:
+            self._symbol_cache[symbol] = resolved
+
+        return resolved
+
+    def _resolve_full_symbol(self, symbol: str) -> Optional[str]:
+        """實際執行後綴解析（未經快取）"""
+        # 已知代碼直接命中
+        if symbol in self._known_symbols:
+            return symbol
+
+        # 如果已經有後綴但不在清單中，檢查價格表是否有資料
+        # （存在性檢查只需數值，省去建立 DataFrame）
         if symbol.endswith(('.TW', '.TWO')):
-            data = self.db.get_stock_prices(symbol, days=5)
-            if not data.empty:
+            if self.db.get_close_array(symbol, days=5).size:
                 return symbol
 
         # 移除可能存在的後綴
         base_symbol = symbol.replace('.TW', '').replace('.TWO', '')
 
-        # 先檢查資料庫中的 .TW（上市）
         tw_symbol = f"{base_symbol}.TW"
-        data = self.db.get_stock_prices(tw_symbol, days=5)
-        if not data.empty:
-            return tw_symbol
-
-        # 再檢查資料庫中的 .TWO（上櫃）
         two_symbol = f"{base_symbol}.TWO"
-        data = self.db.get_stock_prices(two_symbol, days=5)
-        if not data.empty:
+
+        # 先查已知集合（上市優先）
+        if tw_symbol in self._known_symbols:
+            return tw_symbol
+        if two_symbol in self._known_symbols:
             return two_symbol
 
-        # 資料庫中都沒有，嘗試從 yfinance 判斷
-        try:
-            ticker = yf.Ticker(tw_symbol)
-            hist = ticker.history(period="5d")
-            if not hist.empty:
-                return tw_symbol
-        except:
-            pass
+        # 清單中沒有，逐一檢查價格表
+        for candidate in (tw_symbol, two_symbol):
+            if self.db.get_close_array(candidate, days=5).size:
+                return candidate
 
-        try:
-            ticker = yf.Ticker(two_symbol)
-            hist = ticker.history(period="5d")
-            if not hist.empty:
-                return two_symbol
-        except:
-            pass
+        # 資料庫中都沒有，嘗試從 yfinance 判斷
+        for candidate in (tw_symbol, two_symbol):
+            try:
+                ticker = yf.Ticker(candidate)
+                hist = ticker.history(period="5d")
+                if not hist.empty:
+                    return candidate
+            except:
+                pass
 
         # 都找不到，返回 None
         return None
@@ -92,33 +217,43 @@ class CorrelationEngine:
         Returns:
             相關係數（如果資料不足則返回 NaN）
         """
-        # 取得最近 N 天的資料
-        df1 = data1.tail(days).copy()
-        df2 = data2.tail(days).copy()
+        # 取得最近 N 天的資料（長度已符合時不另建切片物件）
+        s1 = data1['close_price']
+        s2 = data2['close_price']
+
+        if len(s1) > days:
+            s1 = s1.iloc[-days:]
+        if len(s2) > days:
+            s2 = s2.iloc[-days:]
 
         # 確保有足夠的資料
-        if len(df1) < days * 0.7 or len(df2) < days * 0.7:
+        if len(s1) < days * 0.7 or len(s2) < days * 0.7:
             return np.nan
 
-        # 合併兩個資料集（只保留兩者都有交易的日期）
-        merged = pd.merge(
-            df1, df2,
-            left_index=True,
-            right_index=True,
-            suffixes=('_1', '_2')
-        )
+        # 取兩者都有交易的日期（已排序索引的交集，免去 merge 的雜湊合併）
+        common = s1.index.intersection(s2.index)
 
-        # 確保合併後有足夠的資料點
-        if len(merged) < days * 0.7:
+        # 確保對齊後有足夠的資料點
+        if len(common) < days * 0.7:
             return np.nan
 
-        # 計算相關係數
-        try:
-            correlation = merged['close_price_1'].corr(merged['close_price_2'])
-            return correlation if not pd.isna(correlation) else np.nan
-        except:
+        # 以 NumPy 內積計算相關係數，不建立中間 DataFrame
+        a = s1.loc[common].to_numpy(dtype=np.float64)
+        b = s2.loc[common].to_numpy(dtype=np.float64)
+
+        mask = ~(np.isnan(a) | np.isnan(b))
+        if mask.sum() < days * 0.7:
             return np.nan
 
+        a = a[mask] - a[mask].mean()
+        b = b[mask] - b[mask].mean()
+
+        denom = np.sqrt(np.dot(a, a) * np.dot(b, b))
+        if denom == 0:
+            return np.nan
+
+        return float(np.dot(a, b) / denom)
+
     def calculate_two_stocks_correlation(
         self,
         symbol1: str,
@@ -152,31 +287,34 @@ class CorrelationEngine:
         if not full_symbol2:
             raise ValueError(f"找不到股票 {symbol2} 的資料（已嘗試 .TW 和 .TWO 後綴）")
 
-        # 取得兩檔股票的價格資料
-        data1 = self.db.get_stock_prices(full_symbol1, days=120)
-        data2 = self.db.get_stock_prices(full_symbol2, days=120)
+        # 確認資料庫中有資料，沒有且有 updater 時嘗試抓取
+        for full_symbol in (full_symbol1, full_symbol2):
+            if self.db.get_close_array(full_symbol, days=5).size == 0 and self.updater:
+                print(f"正在從 yfinance 抓取 {full_symbol} 的資料...")
+                self.updater.update_stock(full_symbol, days=120)
 
-        # 如果資料為空且有 updater，嘗試更新資料
-        if data1.empty and self.updater:
-            print(f"正在從 yfinance 抓取 {full_symbol1} 的資料...")
-            if self.updater.update_stock(full_symbol1, days=120):
-                data1 = self.db.get_stock_prices(full_symbol1, days=120)
-
-        if data2.empty and self.updater:
-            print(f"正在從 yfinance 抓取 {full_symbol2} 的資料...")
-            if self.updater.update_stock(full_symbol2, days=120):
-                data2 = self.db.get_stock_prices(full_symbol2, days=120)
-
-        # 檢查資料是否成功取得
-        if data1.empty:
+        if self.db.get_close_array(full_symbol1, days=5).size == 0:
             raise ValueError(f"找不到股票 {full_symbol1} 的資料")
-        if data2.empty:
+        if self.db.get_close_array(full_symbol2, days=5).size == 0:
             raise ValueError(f"找不到股票 {full_symbol2} 的資料")
 
-        # 計算不同週期的相關係數
-        corr_120 = self.calculate_correlation(data1, data2, 120)
-        corr_60 = self.calculate_correlation(data1, data2, 60)
-        corr_20 = self.calculate_correlation(data1, data2, 20)
+        # 以排序後的代碼對＋最新交易日為鍵查快取：
+        # 收盤後資料不變，同一組合（含反向）重複查詢直接回用
+        latest = self.db.conn.execute(
+            "SELECT MAX(date) FROM stock_prices"
+        ).fetchone()[0]
+        pair_key = (*sorted((full_symbol1, full_symbol2)), latest)
+
+        corrs = self._pair_cache.get(pair_key)
+        if corrs is None:
+            # 相關係數直接在 SQL 引擎內彙總，只取回每個窗口的純量
+            corrs = compute_correlation_sql(
+                self.db, full_symbol1, full_symbol2, windows=(120, 60, 20)
+            )
+            self._pair_cache[pair_key] = corrs
+        corr_120 = corrs[120]
+        corr_60 = corrs[60]
+        corr_20 = corrs[20]
 
         # 取得股票名稱
         cursor = self.db.conn.cursor()
@@ -198,6 +336,224 @@ class CorrelationEngine:
             'corr_20': corr_20 if not pd.isna(corr_20) else 0.0
         }
 
+    def _build_returns_matrix(self, prices: np.ndarray) -> np.ndarray:
+        """
+        將收盤價矩陣轉為對數報酬率矩陣（缺值保留 NaN）
+
+        Args:
+            prices: (n_days, n_symbols) 的收盤價矩陣
+
+        Returns:
+            (n_days - 1, n_symbols) 的對數報酬率矩陣
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.diff(np.log(prices), axis=0)
+
+    def _window_corrs_cumsum(
+        self,
+        R: np.ndarray,
+        target_idx: int,
+        windows: Tuple[int, ...]
+    ) -> List[np.ndarray]:
+        """
+        以前綴和一次算出多個窗口的相關係數
+
+        對報酬率矩陣做一趟 x、y、xy、x²、y² 與有效樣本數的累積和，
+        各窗口的總和即為尾端區間差，再以
+        c = (kΣxy − ΣxΣy) / √((kΣx² − (Σx)²)(kΣy² − (Σy)²))
+        求 Pearson 相關係數；三個重疊窗口共用同一趟掃描
+
+        Args:
+            R: (T, n) 對數報酬率矩陣（缺值為 NaN）
+            target_idx: 目標股票的欄位索引
+            windows: 時間窗口列表
+
+        Returns:
+            與 windows 對應的相關係數陣列列表（資料不足者為 NaN）
+        """
+        T, n = R.shape
+
+        x = R[:, target_idx]
+        target_valid = ~np.isnan(x)
+
+        # 逐對有效遮罩：目標與對方當天都有報酬率
+        col_valid = ~np.isnan(R)
+        both_valid = col_valid & target_valid[:, None]
+
+        x0 = np.nan_to_num(x, nan=0.0)
+        R0 = np.nan_to_num(R, nan=0.0) * target_valid[:, None]
+
+        def _prefix(A: np.ndarray) -> np.ndarray:
+            # 前面補一列 0，窗口總和即為 P[T] - P[T-w]
+            P = np.zeros((T + 1, n), dtype=np.float64)
+            np.cumsum(A, axis=0, dtype=np.float64, out=P[1:])
+            return P
+
+        xcol = x0[:, None]
+        x2col = (x0 * x0)[:, None]
+        cv = col_valid.astype(np.float32)
+
+        # 面板大小的逐元素乘積是記憶體頻寬瓶頸，
+        # 有 numexpr 時融合為單趟掃描
+        if HAVE_NUMEXPR:
+            prod_y2 = ne.evaluate('R0 * R0')
+            prod_xy = ne.evaluate('R0 * xcol')
+            prod_x = ne.evaluate('xcol * cv')
+            prod_x2 = ne.evaluate('x2col * cv')
+        else:
+            prod_y2 = R0 * R0
+            prod_xy = R0 * xcol
+            prod_x = xcol * cv
+            prod_x2 = x2col * cv
+
+        P_y = _prefix(R0)
+        P_y2 = _prefix(prod_y2)
+        P_xy = _prefix(prod_xy)
+        P_x = _prefix(prod_x)
+        P_x2 = _prefix(prod_x2)
+        P_k = _prefix(both_valid)
+
+        corr_by_window = []
+
+        for window in windows:
+            lo = max(T - window, 0)
+
+            k = P_k[T] - P_k[lo]
+            sy = P_y[T] - P_y[lo]
+            sy2 = P_y2[T] - P_y2[lo]
+            sxy = P_xy[T] - P_xy[lo]
+            sx = P_x[T] - P_x[lo]
+            sx2 = P_x2[T] - P_x2[lo]
+
+            # 有效樣本數不足 70% 的股票視為無效
+            valid = k >= window * 0.7
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                cov = k * sxy - sx * sy
+                var = (k * sx2 - sx * sx) * (k * sy2 - sy * sy)
+                corrs = np.where(var > 0, cov / np.sqrt(var), np.nan)
+
+            corrs[~valid] = np.nan
+            corr_by_window.append(corrs)
+
+        return corr_by_window
+
+    def find_correlated_stocks_vectorized(self, target_symbol: str, top_n: int = 20) -> List[Dict]:
+        """
+        找出與目標股票相關性最高的股票（向量化版本）
+
+        一次載入所有股票的收盤價矩陣並轉為標準化對數報酬率，
+        以矩陣乘法同時計算 120/20/10 日的相關係數，
+        避免逐檔查詢資料庫與逐對計算的開銷
+
+        Args:
+            target_symbol: 目標股票代碼
+            top_n: 回傳的股票數量
+
+        Returns:
+            依 120/20/10 日相關係數排序的結果列表:
+            [{'symbol': 代碼, 'name': 名稱,
+              'corr_120': ..., 'corr_20': ..., 'corr_10': ...}, ...]
+        """
+        full_symbol = self.get_full_symbol(target_symbol)
+        if not full_symbol:
+            raise ValueError(f"找不到股票 {target_symbol} 的資料（已嘗試 .TW 和 .TWO 後綴）")
+
+        # 以資料庫最新交易日當快取鍵：同一天內重複查詢同一標的
+        # 直接回用上次的結果，跳過矩陣載入與相關係數計算
+        latest = self.db.conn.execute(
+            "SELECT MAX(date) FROM stock_prices"
+        ).fetchone()[0]
+
+        cache_key = (full_symbol, top_n, latest)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        # 先以單一查詢排除近期資料量不足的股票（上市不久或交易清淡者），
+        # 這些股票載入後也會被 70% 門檻剔除，不如一開始就不撈
+        eligible = self.db.get_eligible_symbols(days=180, min_rows=84)
+        if full_symbol not in eligible:
+            eligible.append(full_symbol)
+
+        # 一次撈出合格股票的收盤價矩陣（多執行緒分段載入），三個窗口共用
+        prices, symbols = self.db.get_all_prices_matrix(
+            days=200, parallel=True, symbols=eligible
+        )
+
+        if not symbols:
+            raise ValueError("資料庫中沒有股價資料，請先更新資料")
+
+        if full_symbol not in symbols:
+            raise ValueError(f"找不到股票 {full_symbol} 的資料")
+
+        target_idx = symbols.index(full_symbol)
+
+        # 收盤價一次轉為對數報酬率，三個窗口共用
+        R = self._build_returns_matrix(prices)
+        windows = (120, 20, 10)
+
+        if HAVE_NUMBA:
+            # 遮罩式核心逐對剔除缺值，三個窗口一趟掃描同時結算
+            R64 = np.ascontiguousarray(R, dtype=np.float64)
+            w_arr = np.asarray(windows, dtype=np.int64)
+            min_obs = np.ceil(w_arr * 0.7).astype(np.int64)
+            corr_by_window = corr_vs_target_multi(R64, target_idx, w_arr, min_obs)
+        else:
+            # NumPy 後援：前綴和讓重疊窗口共用同一趟掃描
+            corr_by_window = self._window_corrs_cumsum(R, target_idx, windows)
+
+        corr_120, corr_20, corr_10 = corr_by_window
+
+        # 排除目標自身與 120 日無效的股票
+        candidates = np.flatnonzero(~np.isnan(corr_120))
+        candidates = candidates[candidates != target_idx]
+
+        if candidates.size == 0:
+            self._search_cache[cache_key] = []
+            return []
+
+        # argpartition 以 O(n) 取出前 top_n，之後只對這一小群做
+        # 多鍵排序（120 日為主鍵、20 日與 10 日為次鍵，由高至低）
+        k = min(top_n, candidates.size)
+        top = candidates[np.argpartition(-corr_120[candidates], k - 1)[:k]]
+        order = top[np.lexsort((
+            np.nan_to_num(corr_10[top], nan=-np.inf),
+            np.nan_to_num(corr_20[top], nan=-np.inf),
+            corr_120[top]
+        ))[::-1]]
+
+        # 取得股票名稱對照表（單一查詢，取代逐檔 SELECT name）
+        names = self.db.get_symbol_names()
+
+        # 只為進榜的股票建立結果字典
+        results = []
+        for idx in order:
+            symbol = symbols[idx]
+            results.append({
+                'symbol': symbol,
+                'name': names.get(symbol, ""),
+                'corr_120': float(corr_120[idx]),
+                'corr_20': float(corr_20[idx]),
+                'corr_10': float(corr_10[idx])
+            })
+
+        self._search_cache[cache_key] = results
+        return results
+
+    def find_correlated_stocks(self, target_symbol: str, top_n: int = 20) -> List[Dict]:
+        """
+        找出與目標股票相關性最高的股票
+
+        Args:
+            target_symbol: 目標股票代碼
+            top_n: 回傳的股票數量
+
+        Returns:
+            排序後的結果列表
+        """
+        return self.find_correlated_stocks_vectorized(target_symbol, top_n)
+
     def format_correlation_strength(self, corr: float) -> str:
         """
         格式化相關係數強度描述
@@ -208,22 +564,30 @@ class CorrelationEngine:
         Returns:
             強度描述字串
         """
-        abs_corr = abs(corr)
+        # 捨入至四位小數後查快取：與 GUI 顯示的精度一致，
+        # 強度標籤不會與畫面上的數值互相矛盾
+        return _strength_text(round(float(corr), 4))
 
-        if abs_corr >= 0.9:
-            strength = "極強"
-        elif abs_corr >= 0.7:
-            strength = "強"
-        elif abs_corr >= 0.5:
-            strength = "中等"
-        elif abs_corr >= 0.3:
-            strength = "弱"
-        else:
-            strength = "極弱"
+    def format_correlation_strength_vec(self, corrs: np.ndarray) -> np.ndarray:
+        """
+        批次格式化相關係數強度描述（向量化版本）
+
+        以 np.digitize 查表取代逐值的 if/elif 階梯，
+        適合一次格式化整批計算結果
+
+        Args:
+            corrs: 相關係數陣列
+
+        Returns:
+            強度描述字串陣列
+        """
+        corrs = np.asarray(corrs, dtype=np.float64)
 
-        direction = "正相關" if corr >= 0 else "負相關"
+        levels = np.digitize(np.abs(corrs), _STRENGTH_BINS)
+        strength = _STRENGTH_LABELS[levels]
+        direction = np.where(corrs >= 0, "正相關", "負相關")
 
-        return f"{strength}{direction}"
+        return np.char.add(strength, direction)
 
 
 if __name__ == "__main__":
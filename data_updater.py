@@ -5,8 +5,10 @@
 
 import yfinance as yf
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional, List
+import threading
 import time
 from database import StockDatabase
 
@@ -23,6 +25,30 @@ class DataUpdater:
         """
         self.db = db
 
+        # 多執行緒抓取時序列化資料庫寫入
+        self._db_lock = threading.Lock()
+        # 節流器狀態：讓各執行緒的請求起始時間至少間隔 delay 秒
+        self._rate_lock = threading.Lock()
+        self._next_request_at = 0.0
+
+    def _throttle(self, delay: float):
+        """
+        簡單的節流器，跨執行緒共用
+
+        Args:
+            delay: 請求之間的最小間隔（秒）
+        """
+        if delay <= 0:
+            return
+
+        with self._rate_lock:
+            now = time.monotonic()
+            wait = self._next_request_at - now
+            self._next_request_at = max(now, self._next_request_at) + delay
+
+        if wait > 0:
+            time.sleep(wait)
+
     def get_full_symbol(self, symbol: str) -> Optional[str]:
         """
         取得完整的股票代碼（自動加上 .TW 或 .TWO 後綴）
@@ -88,20 +114,22 @@ class DataUpdater:
             print(f"  ⚠️  取得 {symbol} 資料時發生錯誤: {e}")
             return None
 
-    def update_stock(self, symbol: str, days: int = 120) -> bool:
+    def update_stock(self, symbol: str, days: int = 120, latest_date: Optional[datetime] = None) -> bool:
         """
         更新單一股票資料（增量更新）
 
         Args:
             symbol: 股票代碼
             days: 需要保留的天數
+            latest_date: 已知的資料庫最新日期（可選，未提供時自行查詢）
 
         Returns:
             是否更新成功
         """
         try:
             # 取得資料庫中的最新日期
-            latest_date = self.db.get_latest_date(symbol)
+            if latest_date is None:
+                latest_date = self.db.get_latest_date(symbol)
 
             # 計算需要抓取的日期範圍
             end_date = datetime.now()
@@ -123,11 +151,10 @@ class DataUpdater:
             if df is None or df.empty:
                 return False
 
-            # 儲存到資料庫
-            self.db.insert_stock_prices(symbol, df)
-
-            # 更新最後更新時間
-            self.db.update_last_update(symbol, end_date)
+            # 儲存到資料庫（寫入需序列化，避免多執行緒交錯）
+            with self._db_lock:
+                self.db.insert_stock_prices(symbol, df)
+                self.db.update_last_update(symbol, end_date)
 
             return True
 
@@ -135,14 +162,117 @@ class DataUpdater:
             print(f"  ⚠️  更新 {symbol} 時發生錯誤: {e}")
             return False
 
-    def update_all_stocks(self, stock_list: List[tuple], days: int = 120, delay: float = 0.5):
+    def update_many(self, symbols: List[str], days: int = 120) -> dict:
+        """
+        以單一批次請求更新多檔股票資料
+
+        yf.download 會在內部並行抓取整批代碼，
+        取代逐檔建立 Ticker 物件與個別 HTTP 請求
+
+        Args:
+            symbols: 股票代碼列表
+            days: 需要保留的天數
+
+        Returns:
+            {symbol: 是否更新成功}
+        """
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=days + 60)
+
+        results = {symbol: False for symbol in symbols}
+
+        try:
+            data = yf.download(
+                tickers=' '.join(symbols),
+                start=start_date,
+                end=end_date,
+                group_by='ticker',
+                threads=True,
+                auto_adjust=False,
+                progress=False
+            )
+        except Exception as e:
+            print(f"  ⚠️  批次抓取失敗（{e}），改用執行緒池逐檔抓取")
+            return self._update_fallback(symbols, days)
+
+        if data is None or data.empty:
+            return self._update_fallback(symbols, days)
+
+        for symbol in symbols:
+            try:
+                if isinstance(data.columns, pd.MultiIndex):
+                    if symbol not in data.columns.get_level_values(0):
+                        continue
+                    closes = data[symbol][['Close']].dropna()
+                else:
+                    # 只有一檔股票時 yf.download 回傳單層欄位
+                    closes = data[['Close']].dropna()
+
+                if closes.empty:
+                    continue
+
+                with self._db_lock:
+                    self.db.insert_stock_prices(symbol, closes)
+                    self.db.update_last_update(symbol, end_date)
+
+                results[symbol] = True
+
+            except Exception as e:
+                print(f"  ⚠️  更新 {symbol} 時發生錯誤: {e}")
+
+        return results
+
+    def _update_fallback(
+        self,
+        symbols: List[str],
+        days: int = 120,
+        delay: float = 0.2,
+        max_workers: int = 8
+    ) -> dict:
         """
-        更新所有股票資料
+        批次 API 失敗時的後援路徑：以執行緒池逐檔抓取
+
+        HTTP 等待期間會釋放 GIL，多個工作執行緒可重疊往返延遲；
+        請求間隔仍透過共用節流器控制
+
+        Args:
+            symbols: 股票代碼列表
+            days: 需要保留的天數
+            delay: 請求之間的最小間隔（秒）
+            max_workers: 執行緒數
+
+        Returns:
+            {symbol: 是否更新成功}
+        """
+        latest_dates = self.db.get_latest_dates()
+
+        def _worker(symbol):
+            self._throttle(delay)
+            return symbol, self.update_stock(
+                symbol, days, latest_date=latest_dates.get(symbol)
+            )
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return dict(executor.map(_worker, symbols))
+
+    def update_all_stocks(
+        self,
+        stock_list: List[tuple],
+        days: int = 120,
+        delay: float = 0.5,
+        chunk_size: int = 50
+    ):
+        """
+        更新所有股票資料（分批批次抓取）
+
+        將股票清單切成區塊，每個區塊以一次 yf.download 批次抓取
+        （內部並行），區塊之間以節流器保持最小間隔
 
         Args:
             stock_list: 股票清單 [(symbol, name), ...]
             days: 需要保留的天數
-            delay: 每次請求之間的延遲（秒）
+            delay: 每個批次之間的最小間隔（秒）
+            chunk_size: 每批的股票數量
         """
         total = len(stock_list)
         success_count = 0
@@ -151,23 +281,27 @@ class DataUpdater:
         print(f"\n開始更新 {total} 檔股票資料...")
         print("=" * 60)
 
-        for i, (symbol, name) in enumerate(stock_list, 1):
-            print(f"[{i}/{total}] 更新 {symbol} ({name})...", end=' ')
-
-            # 將股票加入清單
+        # 先將所有股票加入清單
+        for symbol, name in stock_list:
             self.db.add_stock_to_list(symbol, name)
 
-            # 更新股價資料
-            if self.update_stock(symbol, days):
-                print("✓")
-                success_count += 1
-            else:
-                print("✗")
-                fail_count += 1
+        names = dict(stock_list)
+        done = 0
+
+        for start in range(0, total, chunk_size):
+            chunk = [symbol for symbol, _ in stock_list[start:start + chunk_size]]
+
+            self._throttle(delay)
+            results = self.update_many(chunk, days)
 
-            # 延遲以避免請求過快
-            if i < total:
-                time.sleep(delay)
+            for symbol in chunk:
+                done += 1
+                if results.get(symbol):
+                    print(f"[{done}/{total}] 更新 {symbol} ({names[symbol]})... ✓")
+                    success_count += 1
+                else:
+                    print(f"[{done}/{total}] 更新 {symbol} ({names[symbol]})... ✗")
+                    fail_count += 1
 
         print("=" * 60)
         print(f"更新完成！成功: {success_count}, 失敗: {fail_count}")
@@ -5,6 +5,9 @@
 
 import sqlite3
 import pandas as pd
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from typing import List, Optional, Tuple
 import os
@@ -29,6 +32,17 @@ class StockDatabase:
         self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
         cursor = self.conn.cursor()
 
+        # 效能調校：WAL 讓多執行緒讀取不互相阻塞，
+        # 放大快取與 mmap 減少面板查詢的系統呼叫
+        for pragma in (
+            "journal_mode=WAL",
+            "synchronous=NORMAL",
+            "temp_store=MEMORY",
+            "mmap_size=268435456",
+            "cache_size=-65536",
+        ):
+            cursor.execute(f"PRAGMA {pragma}")
+
         # 建立股票價格表
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS stock_prices (
@@ -42,12 +56,16 @@ class StockDatabase:
             )
         """)
 
-        # 建立索引以加速查詢
+        # 建立涵蓋式索引，讓 symbol + date 的查詢直接從索引讀出
+        # close_price，不需再回主表取資料
         cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_symbol_date
-            ON stock_prices(symbol, date)
+            CREATE INDEX IF NOT EXISTS idx_symbol_date_close
+            ON stock_prices(symbol, date DESC, close_price)
         """)
 
+        # 移除被涵蓋式索引取代的舊索引
+        cursor.execute("DROP INDEX IF EXISTS idx_symbol_date")
+
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_date
             ON stock_prices(date)
@@ -74,8 +92,30 @@ class StockDatabase:
             """)
             print("已為 stock_prices 資料表新增 source 欄位")
 
+        # 更新統計資訊，讓查詢計畫器選用涵蓋式索引
+        cursor.execute("ANALYZE")
+
         self.conn.commit()
 
+    @contextmanager
+    def bulk_mode(self):
+        """
+        大量寫入模式
+
+        期間將 synchronous 降為 OFF，免去每次 commit 的 fsync；
+        回補中斷最多遺失最後一個未完成的交易，重跑即可補回。
+        WAL 與 synchronous=NORMAL 等常態調校已在連線初始化時設定，
+        離開時恢復 NORMAL
+
+        Yields:
+            資料庫實例自身
+        """
+        self.conn.execute("PRAGMA synchronous=OFF")
+        try:
+            yield self
+        finally:
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+
     def insert_stock_prices(self, symbol: str, df: pd.DataFrame, source: str = 'TWSE'):
         """
         插入股票價格資料
@@ -85,18 +125,78 @@ class StockDatabase:
             df: 包含日期索引和 Close 欄位的 DataFrame
             source: 資料來源 (預設 'TWSE'，櫃買中心為 'TPEX')
         """
-        cursor = self.conn.cursor()
+        # 日期與價格走 pandas 的 C 路徑一次轉換完，
+        # 交易範圍內只剩 executemany 本身
+        dates = df.index.strftime('%Y-%m-%d').to_numpy()
+        closes = df['Close'].to_numpy(dtype=float)
+        rows = [(symbol, d, c, source) for d, c in zip(dates, closes)]
 
-        for date, row in df.iterrows():
-            try:
-                cursor.execute("""
+        try:
+            # 以單一交易批次寫入，取代逐列 execute 與逐列 commit
+            with self.conn:
+                self.conn.executemany("""
                     INSERT OR REPLACE INTO stock_prices (symbol, date, close_price, source)
                     VALUES (?, ?, ?, ?)
-                """, (symbol, date.strftime('%Y-%m-%d'), float(row['Close']), source))
-            except Exception as e:
-                print(f"插入資料錯誤 {symbol} {date}: {e}")
+                """, rows)
+        except Exception as e:
+            print(f"批次插入資料錯誤 {symbol}: {e}")
 
-        self.conn.commit()
+    def insert_stock_prices_bulk(self, rows: List[Tuple[str, str, float]], source: str = 'TWSE'):
+        """
+        批次插入多檔股票的價格資料
+
+        供逐日更新路徑使用：整個日期的資料以一次 executemany
+        在單一交易內寫入，取代每檔股票各自建立 DataFrame 與 commit
+
+        Args:
+            rows: (symbol, 日期字串 YYYY-MM-DD, 收盤價) 的列表
+            source: 資料來源 (預設 'TWSE'，櫃買中心為 'TPEX')
+        """
+        if not rows:
+            return
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO stock_prices (symbol, date, close_price, source)
+                VALUES (?, ?, ?, ?)
+            """, [(symbol, d, c, source) for symbol, d, c in rows])
+
+    def insert_price_row(self, symbol: str, date_iso: str, close: float, source: str = 'TWSE'):
+        """
+        插入單筆股價資料
+
+        純量路徑：呼叫端只有一筆 (日期, 收盤價) 時不必為了
+        insert_stock_prices 建一個單列 DataFrame；
+        多筆資料請改用 insert_stock_prices_bulk
+
+        Args:
+            symbol: 股票代碼
+            date_iso: 日期字串（YYYY-MM-DD）
+            close: 收盤價
+            source: 資料來源
+        """
+        with self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO stock_prices (symbol, date, close_price, source)
+                VALUES (?, ?, ?, ?)
+            """, (symbol, date_iso, close, source))
+
+    def add_stocks_to_list_bulk(self, items: List[Tuple[str, str]], market: str = "TW"):
+        """
+        批次新增股票到清單
+
+        Args:
+            items: (symbol, name) 的列表
+            market: 市場代碼
+        """
+        if not items:
+            return
+
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR IGNORE INTO stock_list (symbol, name, market)
+                VALUES (?, ?, ?)
+            """, [(symbol, name, market) for symbol, name in items])
 
     def get_stock_prices(self, symbol: str, days: int = 120) -> pd.DataFrame:
         """
@@ -128,6 +228,206 @@ class StockDatabase:
 
         return df
 
+    def load_price_panel(self, days: int = 200) -> pd.DataFrame:
+        """
+        一次載入所有股票最近 N 個日曆日的收盤價面板
+
+        以單一查詢取代逐檔的 get_stock_prices 呼叫，
+        將 O(N) 次 SQL 往返縮減為一次
+
+        Args:
+            days: 日曆日天數
+
+        Returns:
+            以日期為索引、股票代碼為欄位的 DataFrame（缺值為 NaN），
+            若無資料則回傳空的 DataFrame
+        """
+        query = """
+            SELECT symbol, date, close_price
+            FROM stock_prices
+            WHERE date >= date('now', ?)
+        """
+
+        df = pd.read_sql_query(
+            query, self.conn,
+            params=(f'-{days} days',),
+            parse_dates=['date']
+        )
+
+        if df.empty:
+            return pd.DataFrame()
+
+        panel = df.pivot(index='date', columns='symbol', values='close_price')
+        return panel.sort_index()
+
+    def load_price_panel_parallel(
+        self,
+        days: int = 200,
+        workers: Optional[int] = None,
+        symbols: Optional[List[str]] = None
+    ) -> pd.DataFrame:
+        """
+        以多執行緒分段載入收盤價面板
+
+        將股票代碼切成多個區段，每個執行緒用獨立的 SQLite 連線
+        載入自己的區段，最後以 concat 合併；
+        股票數量不多時直接退回單一查詢
+
+        Args:
+            days: 日曆日天數
+            workers: 執行緒數（預設為 CPU 核心數，上限 8）
+            symbols: 限定載入的股票代碼（可選，預設載入全部）
+
+        Returns:
+            以日期為索引、股票代碼為欄位的 DataFrame
+        """
+        if workers is None:
+            workers = min(os.cpu_count() or 1, 8)
+
+        requested = symbols
+
+        if symbols is None:
+            cursor = self.conn.cursor()
+            symbols = [row[0] for row in cursor.execute(
+                "SELECT DISTINCT symbol FROM stock_prices ORDER BY symbol"
+            )]
+
+        # 資料量小或單執行緒時，分段反而增加開銷；
+        # 退回單一查詢時仍需套用呼叫端指定的股票過濾
+        if workers <= 1 or len(symbols) < 200:
+            panel = self.load_price_panel(days)
+            if requested is not None and not panel.empty:
+                wanted = [s for s in panel.columns if s in set(requested)]
+                panel = panel[wanted]
+            return panel
+
+        chunks = [symbols[i::workers] for i in range(workers)]
+
+        def _load_chunk(chunk: List[str]) -> pd.DataFrame:
+            # 每個執行緒使用自己的連線，避免共用連線序列化
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            try:
+                placeholders = ','.join('?' * len(chunk))
+                query = f"""
+                    SELECT symbol, date, close_price
+                    FROM stock_prices
+                    WHERE date >= date('now', ?) AND symbol IN ({placeholders})
+                """
+                df = pd.read_sql_query(
+                    query, conn,
+                    params=(f'-{days} days', *chunk),
+                    parse_dates=['date']
+                )
+            finally:
+                conn.close()
+
+            if df.empty:
+                return pd.DataFrame()
+
+            return df.pivot(index='date', columns='symbol', values='close_price')
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            frames = [f for f in executor.map(_load_chunk, chunks) if not f.empty]
+
+        if not frames:
+            return pd.DataFrame()
+
+        return pd.concat(frames, axis=1).sort_index()
+
+    def get_all_prices_matrix(
+        self,
+        days: int = 200,
+        parallel: bool = False,
+        symbols: Optional[List[str]] = None
+    ) -> Tuple[np.ndarray, List[str]]:
+        """
+        一次取得所有股票最近 N 個日曆日的收盤價矩陣
+
+        Args:
+            days: 日曆日天數
+            parallel: 是否以多執行緒分段載入
+            symbols: 限定載入的股票代碼（可選，預設載入全部）
+
+        Returns:
+            (prices, symbols) — prices 為 (n_days, n_symbols) 的
+            float32 矩陣，依日期升序排列；symbols 為對應的欄位代碼列表
+        """
+        if parallel:
+            panel = self.load_price_panel_parallel(days, symbols=symbols)
+        else:
+            panel = self.load_price_panel(days)
+            if not panel.empty and symbols is not None:
+                wanted = [s for s in panel.columns if s in set(symbols)]
+                panel = panel[wanted]
+
+        if panel.empty:
+            return np.empty((0, 0), dtype=np.float32), []
+
+        # float32 將記憶體流量減半；column-major 讓每檔股票
+        # 的時間序列在記憶體中連續，符合逐欄運算的存取模式
+        matrix = np.asfortranarray(panel.to_numpy(dtype=np.float32))
+
+        return matrix, list(panel.columns)
+
+    def get_eligible_symbols(self, days: int = 180, min_rows: int = 84) -> List[str]:
+        """
+        取得近 N 個日曆日內有足夠資料筆數的股票代碼
+
+        用於在相關性計算前先排除上市不久或交易清淡的股票，
+        以一個查詢取代逐檔的資料量檢查
+
+        Args:
+            days: 回溯的日曆日天數
+            min_rows: 最低資料筆數
+
+        Returns:
+            符合條件的股票代碼列表
+        """
+        rows = self.conn.execute("""
+            SELECT symbol
+            FROM stock_prices
+            WHERE date >= date('now', ?)
+            GROUP BY symbol
+            HAVING COUNT(*) >= ?
+        """, (f'-{days} days', min_rows)).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get_symbol_names(self) -> dict:
+        """
+        一次取得所有股票代碼與名稱的對照表
+
+        Returns:
+            {symbol: name} 字典
+        """
+        cursor = self.conn.cursor()
+        return dict(cursor.execute("SELECT symbol, name FROM stock_list").fetchall())
+
+    def get_close_array(self, symbol: str, days: int = 120) -> np.ndarray:
+        """
+        取得股票最近 N 天的收盤價陣列（依日期升序）
+
+        跳過 get_stock_prices 的 DatetimeIndex 重建與排序，
+        適合只需要數值序列或存在性檢查的呼叫端；
+        需要日期索引的呼叫端請繼續使用 get_stock_prices
+
+        Args:
+            symbol: 股票代碼
+            days: 天數
+
+        Returns:
+            float32 的收盤價陣列（無資料時為空陣列）
+        """
+        rows = self.conn.execute("""
+            SELECT close_price
+            FROM stock_prices
+            WHERE symbol = ?
+            ORDER BY date DESC
+            LIMIT ?
+        """, (symbol, days)).fetchall()
+
+        return np.asarray([row[0] for row in rows], dtype=np.float32)[::-1]
+
     def get_latest_date(self, symbol: str) -> Optional[datetime]:
         """
         取得股票在資料庫中的最新日期
@@ -138,16 +438,33 @@ class StockDatabase:
         Returns:
             最新日期或 None
         """
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT MAX(date) FROM stock_prices WHERE symbol = ?
-        """, (symbol,))
+        # 直接用連線執行，省去每次配置 Cursor 的開銷
+        result = self.conn.execute(
+            "SELECT MAX(date) FROM stock_prices WHERE symbol = ?", (symbol,)
+        ).fetchone()[0]
 
-        result = cursor.fetchone()[0]
         if result:
             return datetime.strptime(result, '%Y-%m-%d')
         return None
 
+    def get_latest_dates(self) -> dict:
+        """
+        一次取得所有股票在資料庫中的最新日期
+
+        以一個 GROUP BY 查詢取代逐檔的 get_latest_date 呼叫
+
+        Returns:
+            {symbol: 最新日期} 字典（沒有資料的股票不在字典中）
+        """
+        rows = self.conn.execute("""
+            SELECT symbol, MAX(date) FROM stock_prices GROUP BY symbol
+        """).fetchall()
+
+        return {
+            symbol: datetime.strptime(date_str, '%Y-%m-%d')
+            for symbol, date_str in rows if date_str
+        }
+
     def add_stock_to_list(self, symbol: str, name: str = "", market: str = "TW"):
         """
         新增股票到清單
@@ -171,9 +488,8 @@ class StockDatabase:
         Returns:
             股票代碼列表
         """
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT symbol FROM stock_list ORDER BY symbol")
-        return [row[0] for row in cursor.fetchall()]
+        rows = self.conn.execute("SELECT symbol FROM stock_list ORDER BY symbol").fetchall()
+        return [row[0] for row in rows]
 
     def update_last_update(self, symbol: str, date: datetime):
         """
@@ -191,15 +507,11 @@ class StockDatabase:
 
     def get_stocks_count(self) -> int:
         """取得資料庫中的股票數量"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM stock_list")
-        return cursor.fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM stock_list").fetchone()[0]
 
     def get_price_records_count(self) -> int:
         """取得價格記錄總數"""
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM stock_prices")
-        return cursor.fetchone()[0]
+        return self.conn.execute("SELECT COUNT(*) FROM stock_prices").fetchone()[0]
 
     def close(self):
         """關閉資料庫連線"""
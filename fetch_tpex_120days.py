@@ -3,6 +3,7 @@
 抓取櫃買中心最近 120 天的收盤價資料
 """
 
+import logging
 from datetime import datetime, timedelta
 from database import StockDatabase
 from tpex_updater import TPEXUpdater
@@ -11,6 +12,9 @@ import sys
 
 def main():
     """主程式"""
+    # 顯示更新模組的逐日進度訊息
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     print("=" * 80)
     print("櫃買中心股票資料補齊程式")
     print("=" * 80)
@@ -26,7 +30,7 @@ def main():
 
     print(f"\n目標日期範圍: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
     print(f"預計抓取: 120 天的資料")
-    print(f"每次請求間隔: 2 秒（避免被封鎖）")
+    print(f"並行連線數: 4（限制同時請求數，避免被封鎖）")
 
     # 確認是否繼續
     print("\n" + "=" * 80)
@@ -40,12 +44,12 @@ def main():
     print("\n開始抓取資料...")
     print("=" * 80)
 
-    # 更新資料，設定 2 秒延遲
+    # 更新資料：並行抓取，以較保守的連線數控制請求壓力
     try:
         results = updater.update_date_range(
             start_date=start_date,
             end_date=end_date,
-            delay=2.0  # 2 秒間隔
+            max_workers=4  # 同時最多 4 個請求
         )
 
         # 統計結果
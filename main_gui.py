@@ -5,8 +5,8 @@
 """
 
 import tkinter as tk
-from tkinter import ttk, messagebox
-import threading
+from tkinter import ttk, messagebox, font as tkfont
+from concurrent.futures import ThreadPoolExecutor
 from database import StockDatabase
 from correlation_engine import CorrelationEngine
 from data_updater import DataUpdater
@@ -17,7 +17,8 @@ from stock_list import get_sample_stocks
 class CustomButton(tk.Frame):
     """自訂按鈕類別，支援自訂背景色"""
 
-    def __init__(self, parent, text, command, bg="#2c3e50", fg="white", **kwargs):
+    def __init__(self, parent, text, command, bg="#2c3e50", fg="white",
+                 font=("Arial", 11, "bold"), **kwargs):
         super().__init__(parent, bg=bg, **kwargs)
 
         self.command = command
@@ -32,24 +33,30 @@ class CustomButton(tk.Frame):
             text=text,
             bg=bg,
             fg=fg,
-            font=("Arial", 11, "bold"),
+            font=font,
             padx=20,
             pady=8,
             cursor="hand2"
         )
         self.label.pack()
 
-        # 綁定事件
-        self.label.bind("<Button-1>", self._on_click)
+        # 綁定事件：按下/放開各自切換顏色，
+        # 不再以 after 計時器排程還原
+        self.label.bind("<ButtonPress-1>", self._on_press)
+        self.label.bind("<ButtonRelease-1>", self._on_release)
         self.label.bind("<Enter>", self._on_enter)
         self.label.bind("<Leave>", self._on_leave)
-        self.bind("<Button-1>", self._on_click)
+        self.bind("<ButtonPress-1>", self._on_press)
+        self.bind("<ButtonRelease-1>", self._on_release)
 
-    def _on_click(self, event):
-        """點擊事件"""
+    def _on_press(self, event):
+        """按下：切換為作用中顏色"""
         self.label.config(bg=self.bg_active)
         self.config(bg=self.bg_active)
-        self.after(100, lambda: self._reset_color())
+
+    def _on_release(self, event):
+        """放開：還原顏色並執行命令"""
+        self._reset_color()
         if self.command:
             self.command()
 
@@ -72,13 +79,17 @@ class CustomButton(tk.Frame):
         if state == tk.DISABLED:
             self.label.config(bg="#95a5a6", cursor="arrow")
             self.config(bg="#95a5a6")
-            self.label.unbind("<Button-1>")
-            self.unbind("<Button-1>")
+            self.label.unbind("<ButtonPress-1>")
+            self.label.unbind("<ButtonRelease-1>")
+            self.unbind("<ButtonPress-1>")
+            self.unbind("<ButtonRelease-1>")
         else:
             self.label.config(bg=self.bg_normal, cursor="hand2")
             self.config(bg=self.bg_normal)
-            self.label.bind("<Button-1>", self._on_click)
-            self.bind("<Button-1>", self._on_click)
+            self.label.bind("<ButtonPress-1>", self._on_press)
+            self.label.bind("<ButtonRelease-1>", self._on_release)
+            self.bind("<ButtonPress-1>", self._on_press)
+            self.bind("<ButtonRelease-1>", self._on_release)
 
 
 class StockCorrelationApp:
@@ -96,9 +107,50 @@ class StockCorrelationApp:
         self.engine = CorrelationEngine(self.db, self.updater)
         self.tpex_updater = TPEXUpdater(self.db)
 
+        # 具名字型物件：相同的字型元組每次出現 Tk 都會重新解析，
+        # 共用同一份 Font 實例可免去重複建立，也方便日後統一調整
+        self.fonts = {
+            'title': tkfont.Font(family='Arial', size=20, weight='bold'),
+            'body': tkfont.Font(family='Arial', size=11),
+            'bold': tkfont.Font(family='Arial', size=11, weight='bold'),
+            'small': tkfont.Font(family='Arial', size=9),
+            'mono': tkfont.Font(family='Courier New', size=12),
+        }
+
+        # 長駐的工作執行緒池：重複使用同一條執行緒，
+        # 免去每次點擊都建立新 OS 執行緒的成本
+        self._executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix='gui-worker'
+        )
+
         # 建立 UI
         self.create_widgets()
 
+    def _ui(self, fn, *args, **kwargs):
+        """
+        將 GUI 更新排回主執行緒執行
+
+        Tk 元件不可跨執行緒操作，工作執行緒一律透過
+        root.after 把更新交給主迴圈，也不再需要強制 update()
+        """
+        self.root.after(0, lambda: fn(*args, **kwargs))
+
+    def _run_in_background(self, task, button=None):
+        """
+        把耗時工作交給執行緒池執行的共用入口
+
+        集中處理「停用按鈕 → 提交工作」的樣板，
+        新增背景工作的處理器一律經由此處提交；
+        按鈕復原由工作自身的收尾回呼負責
+
+        Args:
+            task: 在工作執行緒執行的函式
+            button: 執行期間要停用的按鈕（可選）
+        """
+        if button is not None:
+            button.config_state(tk.DISABLED)
+        self._executor.submit(task)
+
     def create_widgets(self):
         """建立 UI 元件"""
         # 標題
@@ -108,7 +160,7 @@ class StockCorrelationApp:
         title_label = tk.Label(
             title_frame,
             text="台股相關性分析系統",
-            font=("Arial", 20, "bold"),
+            font=self.fonts['title'],
             bg="#2c3e50",
             fg="white"
         )
@@ -129,25 +181,25 @@ class StockCorrelationApp:
         tk.Label(
             input_frame,
             text="股票代碼 1:",
-            font=("Arial", 11)
+            font=self.fonts['body']
         ).pack(side=tk.LEFT, padx=5)
 
-        self.symbol1_entry = tk.Entry(input_frame, font=("Arial", 11), width=12)
+        self.symbol1_entry = tk.Entry(input_frame, font=self.fonts['body'], width=12)
         self.symbol1_entry.pack(side=tk.LEFT, padx=5)
 
         tk.Label(
             input_frame,
             text="股票代碼 2:",
-            font=("Arial", 11)
+            font=self.fonts['body']
         ).pack(side=tk.LEFT, padx=15)
 
-        self.symbol2_entry = tk.Entry(input_frame, font=("Arial", 11), width=12)
+        self.symbol2_entry = tk.Entry(input_frame, font=self.fonts['body'], width=12)
         self.symbol2_entry.pack(side=tk.LEFT, padx=5)
 
         tk.Label(
             input_frame,
             text="(例如: 2330, 2317)",
-            font=("Arial", 9),
+            font=self.fonts['small'],
             fg="gray"
         ).pack(side=tk.LEFT, padx=5)
 
@@ -155,6 +207,7 @@ class StockCorrelationApp:
             input_frame,
             text="計算相關係數",
             command=self.analyze_correlation,
+            font=self.fonts['bold'],
             bg="#2c3e50",
             fg="white"
         )
@@ -167,7 +220,7 @@ class StockCorrelationApp:
         # 建立結果顯示標籤
         self.result_text = tk.Text(
             result_frame,
-            font=("Courier New", 12),
+            font=self.fonts['mono'],
             height=15,
             wrap=tk.WORD,
             state=tk.DISABLED
@@ -178,7 +231,7 @@ class StockCorrelationApp:
         self.status_label = tk.Label(
             self.root,
             text="就緒",
-            font=("Arial", 9),
+            font=self.fonts['small'],
             bg="#ecf0f1",
             anchor=tk.W,
             padx=10
@@ -200,87 +253,99 @@ class StockCorrelationApp:
             return
 
         def analyze_thread():
-            try:
-                self.status_label.config(text=f"正在計算 {symbol1} 與 {symbol2} 的相關係數...")
-                self.root.update()
+            self._ui(
+                self.status_label.config,
+                text=f"正在計算 {symbol1} 與 {symbol2} 的相關係數..."
+            )
 
+            # 結果顯示、狀態列與按鈕復原合併成單一收尾回呼，
+            # 主迴圈每次分析只需處理一個事件
+            try:
                 # 執行相關性分析
                 result = self.engine.calculate_two_stocks_correlation(symbol1, symbol2)
 
-                # 顯示結果
-                self.display_result(result)
-
-                self.status_label.config(text="計算完成！")
-
             except ValueError as e:
-                self.status_label.config(text=f"錯誤: {str(e)}")
-                messagebox.showerror("錯誤", str(e))
-
-            except Exception as e:
-                self.status_label.config(text=f"計算失敗: {str(e)}")
-                messagebox.showerror("錯誤", f"計算失敗: {str(e)}")
-            finally:
-                self.analyze_btn.config_state(tk.NORMAL)
+                msg = str(e)
 
-        self.analyze_btn.config_state(tk.DISABLED)
+                def finish():
+                    self.status_label.config(text=f"錯誤: {msg}")
+                    self.analyze_btn.config_state(tk.NORMAL)
+                    messagebox.showerror("錯誤", msg)
 
-        thread = threading.Thread(target=analyze_thread, daemon=True)
-        thread.start()
+            except Exception as e:
+                msg = f"計算失敗: {str(e)}"
 
-    def display_result(self, result):
-        """顯示分析結果"""
-        self.result_text.config(state=tk.NORMAL)
-        self.result_text.delete(1.0, tk.END)
+                def finish():
+                    self.status_label.config(text=msg)
+                    self.analyze_btn.config_state(tk.NORMAL)
+                    messagebox.showerror("錯誤", msg)
 
-        # 標題
-        self.result_text.insert(tk.END, "=" * 60 + "\n")
-        self.result_text.insert(tk.END, "          台股相關性分析結果\n")
-        self.result_text.insert(tk.END, "=" * 60 + "\n\n")
-
-        # 股票資訊
-        self.result_text.insert(tk.END, "股票資訊\n")
-        self.result_text.insert(tk.END, "-" * 60 + "\n")
-        self.result_text.insert(tk.END, f"股票 1: {result['symbol1']}")
-        if result['name1']:
-            self.result_text.insert(tk.END, f" ({result['name1']})")
-        self.result_text.insert(tk.END, "\n")
+            else:
+                def finish():
+                    self.display_result(result)
+                    self.status_label.config(text="計算完成！")
+                    self.analyze_btn.config_state(tk.NORMAL)
 
-        self.result_text.insert(tk.END, f"股票 2: {result['symbol2']}")
-        if result['name2']:
-            self.result_text.insert(tk.END, f" ({result['name2']})")
-        self.result_text.insert(tk.END, "\n\n")
+            self.root.after(0, finish)
 
-        # 相關係數
-        self.result_text.insert(tk.END, "相關係數\n")
-        self.result_text.insert(tk.END, "-" * 60 + "\n")
-        self.result_text.insert(tk.END, f"120 日相關係數: {result['corr_120']:>8.4f}\n")
-        self.result_text.insert(tk.END, f" 60 日相關係數: {result['corr_60']:>8.4f}\n")
-        self.result_text.insert(tk.END, f" 20 日相關係數: {result['corr_20']:>8.4f}\n\n")
-
-        # 相關性說明
-        self.result_text.insert(tk.END, "相關性說明\n")
-        self.result_text.insert(tk.END, "-" * 60 + "\n")
+        self._run_in_background(analyze_thread, button=self.analyze_btn)
 
+    def display_result(self, result):
+        """顯示分析結果"""
         corr_120_strength = self.engine.format_correlation_strength(result['corr_120'])
         corr_60_strength = self.engine.format_correlation_strength(result['corr_60'])
         corr_20_strength = self.engine.format_correlation_strength(result['corr_20'])
 
-        self.result_text.insert(tk.END, f"120 日: {corr_120_strength}\n")
-        self.result_text.insert(tk.END, f" 60 日: {corr_60_strength}\n")
-        self.result_text.insert(tk.END, f" 20 日: {corr_20_strength}\n\n")
+        # 先在 Python 端組好整份文字，只呼叫一次 insert，
+        # 避免每行 insert 都觸發一次 Tk 的重排
+        parts = [
+            "=" * 60 + "\n",
+            "          台股相關性分析結果\n",
+            "=" * 60 + "\n\n",
+            # 股票資訊
+            "股票資訊\n",
+            "-" * 60 + "\n",
+            f"股票 1: {result['symbol1']}",
+        ]
+        if result['name1']:
+            parts.append(f" ({result['name1']})")
+        parts.append("\n")
 
-        # 說明
-        self.result_text.insert(tk.END, "=" * 60 + "\n")
-        self.result_text.insert(tk.END, "註:\n")
-        self.result_text.insert(tk.END, "  1.0 = 完全正相關\n")
-        self.result_text.insert(tk.END, "  0.0 = 無相關\n")
-        self.result_text.insert(tk.END, " -1.0 = 完全負相關\n")
-        self.result_text.insert(tk.END, "=" * 60 + "\n")
+        parts.append(f"股票 2: {result['symbol2']}")
+        if result['name2']:
+            parts.append(f" ({result['name2']})")
+        parts.append("\n\n")
+
+        parts += [
+            # 相關係數
+            "相關係數\n",
+            "-" * 60 + "\n",
+            f"120 日相關係數: {result['corr_120']:>8.4f}\n",
+            f" 60 日相關係數: {result['corr_60']:>8.4f}\n",
+            f" 20 日相關係數: {result['corr_20']:>8.4f}\n\n",
+            # 相關性說明
+            "相關性說明\n",
+            "-" * 60 + "\n",
+            f"120 日: {corr_120_strength}\n",
+            f" 60 日: {corr_60_strength}\n",
+            f" 20 日: {corr_20_strength}\n\n",
+            # 說明
+            "=" * 60 + "\n",
+            "註:\n",
+            "  1.0 = 完全正相關\n",
+            "  0.0 = 無相關\n",
+            " -1.0 = 完全負相關\n",
+            "=" * 60 + "\n",
+        ]
 
+        self.result_text.config(state=tk.NORMAL)
+        self.result_text.delete(1.0, tk.END)
+        self.result_text.insert(tk.END, ''.join(parts))
         self.result_text.config(state=tk.DISABLED)
 
     def on_closing(self):
         """視窗關閉時的處理"""
+        self._executor.shutdown(wait=False)
         self.db.close()
         self.root.destroy()
 
@@ -9,6 +9,17 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
+# Ticker 物件會保留連線與中繼資料，同一代碼重複查詢時直接重用
+_TICKER_CACHE = {}
+
+
+def _get_ticker(symbol: str) -> yf.Ticker:
+    """取得（或重用快取的）yfinance Ticker 物件"""
+    ticker = _TICKER_CACHE.get(symbol)
+    if ticker is None:
+        ticker = _TICKER_CACHE[symbol] = yf.Ticker(symbol)
+    return ticker
+
 
 def get_stock_data(symbol: str, days: int = 150) -> pd.DataFrame:
     """
@@ -25,13 +36,21 @@ def get_stock_data(symbol: str, days: int = 150) -> pd.DataFrame:
     if not symbol.endswith('.TW') and not symbol.endswith('.TWO'):
         symbol = f"{symbol}.TW"
 
-    # 計算起始日期（多抓一些資料以確保有足夠的交易日）
+    # 計算起始日期：1.5 倍日曆天已足以涵蓋週末與假日，
+    # 不必多抓 100 天再丟掉
     end_date = datetime.now()
-    start_date = end_date - timedelta(days=days + 100)
+    start_date = end_date - timedelta(days=int(days * 1.5) + 10)
 
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(start=start_date, end=end_date)
+        ticker = _get_ticker(symbol)
+        # 只需要收盤價，不要股利/分割事件與盤前盤後資料
+        hist = ticker.history(
+            start=start_date,
+            end=end_date,
+            auto_adjust=False,
+            prepost=False,
+            actions=False
+        )
 
         if hist.empty:
             raise ValueError(f"無法取得股票 {symbol} 的資料")
@@ -42,32 +61,126 @@ def get_stock_data(symbol: str, days: int = 150) -> pd.DataFrame:
         raise Exception(f"取得股票 {symbol} 資料時發生錯誤: {str(e)}")
 
 
-def calculate_correlation(stock1_data: pd.DataFrame, stock2_data: pd.DataFrame, days: int) -> float:
+def get_stock_data_batch(symbols: list, days: int = 150) -> dict:
     """
-    計算兩個股票在指定天數內的相關係數
+    以單一批次請求取得多檔台股的歷史資料
+
+    一次 yf.download（內部並行）取代逐檔的 Ticker.history 呼叫，
+    N 個序列的 HTTPS 往返縮減為一個批次
 
     Args:
-        stock1_data: 股票1的價格資料
-        stock2_data: 股票2的價格資料
-        days: 計算的天數
+        symbols: 股票代碼列表（無後綴時自動補上 .TW）
+        days: 取得的天數
 
     Returns:
-        相關係數
+        {完整代碼: 含收盤價的 DataFrame} 字典（抓不到資料的股票不在字典中）
     """
-    # 取得最近 N 天的資料
-    data1 = stock1_data.tail(days)
-    data2 = stock2_data.tail(days)
+    full_symbols = [
+        s if s.endswith(('.TW', '.TWO')) else f"{s}.TW"
+        for s in symbols
+    ]
 
-    # 合併兩個資料集（只保留兩者都有交易的日期）
-    merged = pd.merge(data1, data2, left_index=True, right_index=True, suffixes=('_1', '_2'))
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=days + 100)
 
-    if len(merged) < days * 0.8:  # 如果實際資料少於預期的 80%，發出警告
-        print(f"  ⚠️  警告：只有 {len(merged)} 個交易日的資料（預期 {days} 日）")
+    data = yf.download(
+        tickers=' '.join(full_symbols),
+        start=start_date,
+        end=end_date,
+        group_by='ticker',
+        threads=True,
+        auto_adjust=False,
+        progress=False
+    )
+
+    result = {}
+
+    if data is None or data.empty:
+        return result
+
+    for full_symbol in full_symbols:
+        if isinstance(data.columns, pd.MultiIndex):
+            if full_symbol not in data.columns.get_level_values(0):
+                continue
+            closes = data[full_symbol][['Close']].dropna()
+        else:
+            # 只有一檔股票時 yf.download 回傳單層欄位
+            closes = data[['Close']].dropna()
+
+        if not closes.empty:
+            result[full_symbol] = closes
+
+    return result
+
+
+def calculate_correlations(
+    stock1_data: pd.DataFrame,
+    stock2_data: pd.DataFrame,
+    windows: tuple = (120, 20, 10)
+) -> list:
+    """
+    一次計算兩個股票在多個時間窗口的相關係數
 
-    # 計算相關係數
-    correlation = merged['Close_1'].corr(merged['Close_2'])
+    兩個序列只對齊一次（只保留兩者都有交易的日期），
+    各窗口直接取對齊後矩陣的尾端切片計算，
+    避免每個窗口重複執行合併與型別轉換
 
-    return correlation
+    Args:
+        stock1_data: 股票1的價格資料
+        stock2_data: 股票2的價格資料
+        windows: 時間窗口列表（天數）
+
+    Returns:
+        [(天數, 相關係數), ...] 的列表
+    """
+    # 對齊一次：兩邊的日期索引已排序且不重複，
+    # intersect1d + searchsorted 直接取得交集位置，
+    # 免去 pandas concat/join 建立新 DataFrame 與索引合併的開銷
+    idx1 = stock1_data.index.to_numpy()
+    idx2 = stock2_data.index.to_numpy()
+    common = np.intersect1d(idx1, idx2, assume_unique=True)
+
+    # SoA 佈局：兩條連續的 float32 陣列取代 (天數, 2) 交錯矩陣，
+    # 逐元素乘積的記憶體流量減半；價格精度遠在 float32 的 7 位有效數字內
+    x = stock1_data['Close'].to_numpy(dtype=np.float32)[np.searchsorted(idx1, common)]
+    y = stock2_data['Close'].to_numpy(dtype=np.float32)[np.searchsorted(idx2, common)]
+    n_total = len(x)
+
+    # 一趟掃描建立 x、y、x²、y²、xy 的前綴和（前面補 0 方便取區間差），
+    # 重疊的窗口共用同一份累積和，不再逐窗口重算平均與離差；
+    # 累加與最終係數仍以 float64 計算，避免長序列累積誤差
+    zero = np.zeros(1)
+    sx = np.concatenate((zero, np.cumsum(x, dtype=np.float64)))
+    sy = np.concatenate((zero, np.cumsum(y, dtype=np.float64)))
+    sxx = np.concatenate((zero, np.cumsum(x * x, dtype=np.float64)))
+    syy = np.concatenate((zero, np.cumsum(y * y, dtype=np.float64)))
+    sxy = np.concatenate((zero, np.cumsum(x * y, dtype=np.float64)))
+
+    results = []
+
+    for days in windows:
+        k = min(days, n_total)
+
+        if k < days * 0.8:  # 如果實際資料少於預期的 80%，發出警告
+            print(f"  ⚠️  警告：只有 {k} 個交易日的資料（預期 {days} 日）")
+
+        lo = n_total - k
+        wx = sx[-1] - sx[lo]
+        wy = sy[-1] - sy[lo]
+        wxx = sxx[-1] - sxx[lo]
+        wyy = syy[-1] - syy[lo]
+        wxy = sxy[-1] - sxy[lo]
+
+        # c = (kΣxy − ΣxΣy) / √((kΣx² − (Σx)²)(kΣy² − (Σy)²))
+        denom = (k * wxx - wx * wx) * (k * wyy - wy * wy)
+        if denom > 0:
+            correlation = (k * wxy - wx * wy) / np.sqrt(denom)
+        else:
+            correlation = float('nan')
+
+        results.append((days, correlation))
+
+    return results
 
 
 def main():
@@ -83,21 +196,28 @@ def main():
     print()
 
     try:
-        # 取得股票資料
+        # 取得股票資料（兩檔股票併成一個批次請求）
         print("正在取得股票資料...")
-        stock1_data = get_stock_data(stock1, days=150)
-        stock2_data = get_stock_data(stock2, days=150)
+
+        full1 = stock1 if stock1.endswith(('.TW', '.TWO')) else f"{stock1}.TW"
+        full2 = stock2 if stock2.endswith(('.TW', '.TWO')) else f"{stock2}.TW"
+
+        batch = get_stock_data_batch([stock1, stock2], days=150)
+
+        if full1 not in batch:
+            raise ValueError(f"無法取得股票 {full1} 的資料")
+        if full2 not in batch:
+            raise ValueError(f"無法取得股票 {full2} 的資料")
+
+        stock1_data = batch[full1]
+        stock2_data = batch[full2]
+
         print("✓ 資料取得完成")
         print()
 
-        # 計算相關係數
-        periods = [120, 20, 10]
-        results = []
-
+        # 計算相關係數（三個窗口共用一次對齊）
         print("計算相關係數中...")
-        for period in periods:
-            corr = calculate_correlation(stock1_data, stock2_data, period)
-            results.append((period, corr))
+        results = calculate_correlations(stock1_data, stock2_data, windows=(120, 20, 10))
 
         print()
         print("=" * 60)
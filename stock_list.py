@@ -3,9 +3,76 @@
 取得台灣股市的股票代碼列表
 """
 
+import json
+import os
+import re
 import requests
-from typing import List, Tuple
-import time
+from requests.adapters import HTTPAdapter
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+# 兩個 ISIN 頁面都在同一台主機上：共用連線池重用 TLS 連線，
+# 並以 gzip 壓縮傳輸（頁面是重複性高的 HTML 表格，壓縮率很好）
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_connections=4, pool_maxsize=8, max_retries=3
+))
+_SESSION.headers.update({
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Accept-Encoding': 'gzip, deflate',
+})
+
+# 股票清單快取目錄：清單只在 TWSE 公告新 ISIN 時才會變動，
+# 以當日日期為鍵快取，同一天內重複查詢直接讀檔
+_CACHE_DIR = os.path.expanduser(os.path.join('~', '.stock-tools'))
+
+
+# ISIN 頁面的股票列格式為「代碼　名稱<TAB>...股票...」，
+# 以單一正規表達式掃描全文取代逐行 split（只取 4 位數字代碼）
+_STOCK_LINE_RE = re.compile(r'^\s*(\d{4})　([^\t]+)\t.*?股票', re.M)
+
+
+def _parse_stock_lines(text: str, suffix: str) -> List[Tuple[str, str]]:
+    """
+    解析 ISIN 頁面全文，取出股票代碼與名稱
+
+    Args:
+        text: big5 解碼後的頁面全文
+        suffix: 市場後綴（'.TW' 或 '.TWO'）
+
+    Returns:
+        List of (symbol, name) tuples
+    """
+    return [
+        (code + suffix, name.strip())
+        for code, name in _STOCK_LINE_RE.findall(text)
+    ]
+
+
+def _cache_path() -> str:
+    """取得當日股票清單快取的檔案路徑"""
+    return os.path.join(_CACHE_DIR, f"stocks-{datetime.now().strftime('%Y%m%d')}.json")
+
+
+def _load_cached_stocks() -> Optional[List[Tuple[str, str]]]:
+    """讀取當日的股票清單快取（不存在或毀損時回傳 None）"""
+    try:
+        with open(_cache_path(), 'r', encoding='utf-8') as f:
+            return [tuple(item) for item in json.load(f)]
+    except (OSError, ValueError):
+        return None
+
+
+def _save_cached_stocks(stocks: List[Tuple[str, str]]):
+    """將股票清單寫入當日快取（先寫暫存檔再原子性替換）"""
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        tmp_path = _cache_path() + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(stocks, f, ensure_ascii=False)
+        os.replace(tmp_path, _cache_path())
+    except OSError as e:
+        print(f"寫入股票清單快取失敗: {e}")
 
 
 def get_twse_stock_list() -> List[Tuple[str, str]]:
@@ -20,25 +87,13 @@ def get_twse_stock_list() -> List[Tuple[str, str]]:
     try:
         # TWSE 上市股票列表 API
         url = "https://isin.twse.com.tw/isin/C_public.jsp?strMode=2"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
 
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'big5'
+        response = _SESSION.get(url, timeout=10)
 
         if response.status_code == 200:
-            lines = response.text.split('\n')
-            for line in lines:
-                if '股票' in line:  # 只取股票類型
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        code_name = parts[0].strip()
-                        if '　' in code_name:
-                            code, name = code_name.split('　', 1)
-                            # 只取4位數字的股票代碼（排除 ETF 等）
-                            if code.isdigit() and len(code) == 4:
-                                stocks.append((code + '.TW', name.strip()))
+            # 整頁解碼後一次掃描（排除 ETF 等非 4 位數代碼）
+            text = response.content.decode('big5', errors='ignore')
+            stocks = _parse_stock_lines(text, '.TW')
 
     except Exception as e:
         print(f"取得上市股票清單時發生錯誤: {e}")
@@ -58,25 +113,13 @@ def get_tpex_stock_list() -> List[Tuple[str, str]]:
     try:
         # TPEx 上櫃股票列表 API
         url = "https://isin.twse.com.tw/isin/C_public.jsp?strMode=4"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
 
-        response = requests.get(url, headers=headers, timeout=10)
-        response.encoding = 'big5'
+        response = _SESSION.get(url, timeout=10)
 
         if response.status_code == 200:
-            lines = response.text.split('\n')
-            for line in lines:
-                if '股票' in line:  # 只取股票類型
-                    parts = line.split('\t')
-                    if len(parts) >= 2:
-                        code_name = parts[0].strip()
-                        if '　' in code_name:
-                            code, name = code_name.split('　', 1)
-                            # 只取4位數字的股票代碼
-                            if code.isdigit() and len(code) == 4:
-                                stocks.append((code + '.TWO', name.strip()))
+            # 整頁解碼後一次掃描
+            text = response.content.decode('big5', errors='ignore')
+            stocks = _parse_stock_lines(text, '.TWO')
 
     except Exception as e:
         print(f"取得上櫃股票清單時發生錯誤: {e}")
@@ -91,12 +134,17 @@ def get_all_taiwan_stocks() -> List[Tuple[str, str]]:
     Returns:
         List of (symbol, name) tuples
     """
+    # 先檢查當日快取，命中時完全跳過 HTTP 抓取與解析
+    cached = _load_cached_stocks()
+    if cached:
+        print(f"使用當日快取的台股清單（共 {len(cached)} 檔）")
+        return cached
+
     print("正在取得台股清單...")
 
     # 取得上市股票
     print("  - 取得上市股票...")
     twse_stocks = get_twse_stock_list()
-    time.sleep(1)  # 避免請求過快
 
     # 取得上櫃股票
     print("  - 取得上櫃股票...")
@@ -108,6 +156,10 @@ def get_all_taiwan_stocks() -> List[Tuple[str, str]]:
     print(f"    上市: {len(twse_stocks)} 檔")
     print(f"    上櫃: {len(tpex_stocks)} 檔")
 
+    # 成功取得完整清單時寫入當日快取
+    if twse_stocks and tpex_stocks:
+        _save_cached_stocks(all_stocks)
+
     return all_stocks
 
 
@@ -3,29 +3,102 @@
 從台灣證券櫃檯買賣中心 API 取得股票收盤價
 """
 
+import gzip
+import json
+import logging
+import os
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import numpy as np
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
-import time
 import urllib3
 
 # 抑制 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# 進度與錯誤走 logging：未設定 handler 時預設只有 WARNING 會輸出，
+# 互動腳本可在進入點用 basicConfig(level=INFO) 開啟進度訊息
+logger = logging.getLogger(__name__)
+
+# orjson 的 C 解析器比標準庫 json 快數倍，
+# 每日約 800 KB 的行情 JSON 受益明顯；未安裝時退回 response.json()
+try:
+    import orjson
+    HAVE_ORJSON = True
+except ImportError:
+    HAVE_ORJSON = False
+
+# ijson 可直接從回應串流解析，只實體化需要的表格，
+# 並行抓取多個日期時可壓低記憶體峰值；未安裝時退回整包解析
+try:
+    import ijson
+    HAVE_IJSON = True
+except ImportError:
+    HAVE_IJSON = False
+
 
 class TPEXFetcher:
     """櫃買中心股價資料抓取器"""
 
     BASE_URL = "https://www.tpex.org.tw/www/zh-tw/afterTrading/dailyQuotes"
 
+    # 歷史行情收盤後不會變動，以日期為鍵快取在磁碟上，
+    # 重跑回補時不必重新下載
+    CACHE_DIR = os.path.join('cache', 'tpex')
+
     def __init__(self):
         """初始化 fetcher"""
         self.session = requests.Session()
+
+        # 加大連線池以配合多執行緒抓取（預設池只有 10 條連線），
+        # 並對暫時性的 5xx 錯誤自動退避重試，避免單一日期整個失敗
+        adapter = HTTPAdapter(
+            pool_connections=16,
+            pool_maxsize=32,
+            max_retries=Retry(
+                total=3,
+                backoff_factor=0.3,
+                status_forcelist=[500, 502, 503, 504]
+            )
+        )
+        self.session.mount('https://', adapter)
+
         self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+            # JSON 重複性高，gzip 壓縮可大幅縮小傳輸量
+            'Accept-Encoding': 'gzip, deflate',
         })
 
+        # 程序內快取：同一次執行內重複查同一天直接命中
+        self._quote_cache: Dict[str, Optional[List[List]]] = {}
+
+    def _cache_path(self, cache_key: str) -> str:
+        """取得指定日期的磁碟快取檔案路徑"""
+        return os.path.join(self.CACHE_DIR, f"{cache_key}.json.gz")
+
+    def _load_cached_quotes(self, cache_key: str) -> Optional[List[List]]:
+        """讀取磁碟快取（不存在或毀損時回傳 None）"""
+        try:
+            with gzip.open(self._cache_path(cache_key), 'rt', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_cached_quotes(self, cache_key: str, data: List[List]):
+        """將行情資料寫入磁碟快取（先寫暫存檔再原子性替換）"""
+        try:
+            os.makedirs(self.CACHE_DIR, exist_ok=True)
+            tmp_path = self._cache_path(cache_key) + '.tmp'
+            with gzip.open(tmp_path, 'wt', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_path(cache_key))
+        except OSError as e:
+            logger.warning("寫入行情快取失敗: %s", e)
+
     def fetch_daily_quotes(self, date: datetime) -> Optional[List[List]]:
         """
         抓取指定日期的櫃買市場收盤價資料
@@ -39,6 +112,18 @@ class TPEXFetcher:
         """
         # 格式化日期為 YYYY/MM/DD
         date_str = date.strftime('%Y/%m/%d')
+        cache_key = date.strftime('%Y%m%d')
+
+        # 歷史日期先查快取；今日行情盤中仍會變動，一律走網路
+        is_today = date.date() == datetime.now().date()
+        if not is_today:
+            if cache_key in self._quote_cache:
+                return self._quote_cache[cache_key]
+
+            cached = self._load_cached_quotes(cache_key)
+            if cached is not None:
+                self._quote_cache[cache_key] = cached
+                return cached
 
         params = {
             'date': date_str,
@@ -47,28 +132,64 @@ class TPEXFetcher:
         }
 
         try:
-            response = self.session.get(self.BASE_URL, params=params, timeout=10, verify=False)
+            response = self.session.get(
+                self.BASE_URL, params=params, timeout=10, verify=False,
+                stream=HAVE_IJSON
+            )
             response.raise_for_status()
 
-            data = response.json()
+            if HAVE_IJSON:
+                # 串流解析：直接從回應串流取出第一個表格就停止，
+                # 不將整份 JSON 實體化成 Python 物件
+                response.raw.decode_content = True
+                try:
+                    table = next(
+                        ijson.items(response.raw, 'tables.item', use_float=True),
+                        None
+                    )
+                except ijson.JSONError as e:
+                    # TPEX 偶爾以 HTTP 200 回傳 HTML 錯誤頁，
+                    # ijson 的例外不是 ValueError，需在此攔截
+                    logger.warning("解析 %s 資料時發生錯誤: %s", date_str, e)
+                    return None
+                finally:
+                    # 串流沒有讀完，連線無法歸還連線池，主動關閉
+                    response.close()
+
+                if table is None or not table.get('data'):
+                    logger.info("%s 無交易資料（可能為非交易日）", date_str)
+                    return None
+
+                raw_rows = table['data']
+            else:
+                if HAVE_ORJSON:
+                    data = orjson.loads(response.content)
+                else:
+                    data = response.json()
+
+                # 檢查回應結構
+                if 'tables' not in data:
+                    logger.warning("%s 無 tables 資料", date_str)
+                    return None
+
+                if not data['tables'] or 'data' not in data['tables'][0]:
+                    logger.info("%s 無交易資料（可能為非交易日）", date_str)
+                    return None
 
-            # 檢查回應結構
-            if 'tables' not in data:
-                print(f"警告：{date_str} 無 tables 資料")
-                return None
+                raw_rows = data['tables'][0]['data']
 
-            if not data['tables'] or 'data' not in data['tables'][0]:
-                print(f"警告：{date_str} 無交易資料（可能為非交易日）")
-                return None
+            # 返回股票資料，歷史日期順手寫入快取
+            if not is_today:
+                self._quote_cache[cache_key] = raw_rows
+                self._save_cached_quotes(cache_key, raw_rows)
 
-            # 返回股票資料
-            return data['tables'][0]['data']
+            return raw_rows
 
         except requests.RequestException as e:
-            print(f"抓取 {date_str} 資料時發生錯誤: {e}")
+            logger.warning("抓取 %s 資料時發生錯誤: %s", date_str, e)
             return None
         except (KeyError, ValueError) as e:
-            print(f"解析 {date_str} 資料時發生錯誤: {e}")
+            logger.warning("解析 %s 資料時發生錯誤: %s", date_str, e)
             return None
 
     def parse_stock_data(self, raw_data: List[List]) -> List[Dict]:
@@ -86,36 +207,65 @@ class TPEXFetcher:
                 'close_price': 收盤價
             }, ...]
         """
-        parsed_data = []
+        symbols, names, prices = self._clean_raw_rows(raw_data)
 
-        for row in raw_data:
-            try:
-                # 確保有足夠的欄位
-                if len(row) < 3:
-                    continue
+        return [
+            {'symbol': symbol, 'name': name, 'close_price': price}
+            for symbol, name, price in zip(
+                symbols.tolist(), names.tolist(), prices.tolist()
+            )
+        ]
 
-                symbol = str(row[0]).strip()
-                name = str(row[1]).strip()
-                close_price_str = str(row[2]).strip()
+    def _clean_raw_rows(self, raw_data: List[List]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        清理原始列資料的數值核心
+
+        確保有足夠的欄位後轉成三條欄位陣列，
+        清理（strip/去逗號/過濾）以 numpy 字串運算整欄處理，
+        取代逐列 strip/replace/float 的 Python 迴圈
+
+        Args:
+            raw_data: 原始資料列表
+
+        Returns:
+            (代號, 名稱, 收盤價) 三條等長的 numpy 陣列
+        """
+        rows = [(str(r[0]), str(r[1]), str(r[2])) for r in raw_data if len(r) >= 3]
+
+        if not rows:
+            empty_str = np.empty(0, dtype=str)
+            return empty_str, empty_str, np.empty(0, dtype=np.float64)
 
-                # 跳過空值或無效資料
-                if not symbol or not close_price_str or close_price_str == '-':
-                    continue
+        arr = np.asarray(rows, dtype=str)
 
-                # 轉換收盤價（移除逗號）
-                close_price = float(close_price_str.replace(',', ''))
+        symbols = np.char.strip(arr[:, 0])
+        names = np.char.strip(arr[:, 1])
+        prices_str = np.char.replace(np.char.strip(arr[:, 2]), ',', '')
 
-                parsed_data.append({
-                    'symbol': symbol,
-                    'name': name,
-                    'close_price': close_price
-                })
+        # 跳過空值或無效資料
+        mask = (symbols != '') & (prices_str != '') & (prices_str != '-')
 
-            except (ValueError, IndexError) as e:
-                print(f"解析資料錯誤: {row}, {e}")
-                continue
+        symbols = symbols[mask]
+        names = names[mask]
+        prices_str = prices_str[mask]
 
-        return parsed_data
+        try:
+            prices = prices_str.astype(np.float64)
+        except ValueError:
+            # 出現預期外的非數值收盤價時，逐列剔除無法轉換的資料
+            keep = np.ones(len(prices_str), dtype=bool)
+            prices = np.empty(len(prices_str), dtype=np.float64)
+            for i, price_str in enumerate(prices_str):
+                try:
+                    prices[i] = float(price_str)
+                except ValueError:
+                    logger.warning("解析資料錯誤: %s 收盤價 %r", symbols[i], price_str)
+                    keep[i] = False
+            symbols = symbols[keep]
+            names = names[keep]
+            prices = prices[keep]
+
+        return symbols, names, prices
 
     def fetch_and_parse(self, date: datetime) -> Optional[List[Dict]]:
         """
@@ -138,38 +288,47 @@ class TPEXFetcher:
         self,
         start_date: datetime,
         end_date: datetime,
-        delay: float = 1.0
+        max_workers: int = 8
     ) -> Dict[str, List[Dict]]:
         """
-        抓取日期範圍內的股票資料
+        抓取日期範圍內的股票資料（多執行緒並行）
+
+        抓取是純 I/O 等待，requests 等回應時會釋放 GIL，
+        以執行緒池同時抓多個日期可重疊 HTTP 往返時間；
+        max_workers 同時也是對 TPEX 的並行請求上限，
+        取代原本逐日抓取加固定 sleep 的節流方式
 
         Args:
             start_date: 起始日期
             end_date: 結束日期
-            delay: 每次請求間的延遲（秒）
+            max_workers: 同時抓取的日期數
 
         Returns:
             {日期字串: 股票資料列表} 的字典
         """
-        results = {}
+        # 週六日必定回傳「無交易資料」，先在客戶端過濾，
+        # 省下約三成的無效請求；日期字串也一次格式化完，
+        # 迴圈內不再重複呼叫 strftime
+        dates = []
+        date_strs = []
         current_date = start_date
-
         while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
-            print(f"抓取 {date_str} 的資料...")
-
-            data = self.fetch_and_parse(current_date)
+            if current_date.weekday() < 5:
+                dates.append(current_date)
+                date_strs.append(current_date.strftime('%Y-%m-%d'))
+            current_date += timedelta(days=1)
 
-            if data:
-                results[date_str] = data
-                print(f"  成功抓取 {len(data)} 檔股票")
-            else:
-                print(f"  {date_str} 無資料")
+        logger.info("並行抓取 %d 個日期的資料...", len(dates))
 
-            # 延遲以避免過度請求
-            time.sleep(delay)
+        results = {}
 
-            current_date += timedelta(days=1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for date_str, data in zip(date_strs, executor.map(self.fetch_and_parse, dates)):
+                if data:
+                    results[date_str] = data
+                    logger.info("  %s 成功抓取 %d 檔股票", date_str, len(data))
+                else:
+                    logger.info("  %s 無資料", date_str)
 
         return results
 
@@ -3,12 +3,17 @@
 將櫃買中心股價資料存入資料庫
 """
 
-import pandas as pd
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from database import StockDatabase
 from tpex_fetcher import TPEXFetcher
 from typing import List, Dict
 
+# 進度與錯誤走 logging：未設定 handler 時預設只有 WARNING 會輸出，
+# 互動腳本可在進入點用 basicConfig(level=INFO) 開啟進度訊息
+logger = logging.getLogger(__name__)
+
 
 class TPEXUpdater:
     """櫃買中心資料更新器"""
@@ -23,6 +28,10 @@ class TPEXUpdater:
         self.db = db
         self.fetcher = TPEXFetcher()
 
+        # 已在清單中的股票集合：回補 120 天時同一批股票
+        # 會每天重複出現，查集合即可略過幾乎全部的清單 upsert
+        self._stocks_seen = set(self.db.get_all_symbols())
+
     def update_single_date(self, date: datetime) -> int:
         """
         更新指定日期的所有櫃買股票資料
@@ -33,77 +42,95 @@ class TPEXUpdater:
         Returns:
             成功更新的股票數量
         """
-        print(f"\n正在抓取 {date.strftime('%Y-%m-%d')} 的櫃買中心資料...")
+        date_str = date.strftime('%Y-%m-%d')
+        logger.info("正在抓取 %s 的櫃買中心資料...", date_str)
 
         data = self.fetcher.fetch_and_parse(date)
 
-        if data is None or len(data) == 0:
-            print("  無資料或非交易日")
-            return 0
-
-        success_count = 0
-
-        for stock in data:
-            try:
-                symbol = stock['symbol']
-                close_price = stock['close_price']
+        count = self._store_parsed_data(date_str, data)
+        logger.info("%s: 更新 %d 檔股票", date_str, count)
+        return count
 
-                # 將資料轉換為 DataFrame 格式
-                df = pd.DataFrame({
-                    'Close': [close_price]
-                }, index=[date])
-
-                # 存入資料庫，標記來源為 TPEX
-                self.db.insert_stock_prices(symbol, df, source='TPEX')
-
-                # 更新股票清單
-                self.db.add_stock_to_list(
-                    symbol=symbol,
-                    name=stock['name'],
-                    market='TPEX'
-                )
+    def _store_parsed_data(self, date_str: str, data) -> int:
+        """
+        將解析完成的單日資料寫入資料庫
 
-                success_count += 1
+        Args:
+            date_str: 日期字串（YYYY-MM-DD）
+            data: parse_stock_data 的輸出（None 表示非交易日）
 
-            except Exception as e:
-                print(f"  錯誤：無法更新 {stock['symbol']}: {e}")
-                continue
+        Returns:
+            成功更新的股票數量
+        """
+        if data is None or len(data) == 0:
+            return 0
 
-        print(f"  成功更新 {success_count} 檔股票")
-        return success_count
+        # 整個日期的資料組成元組列表，兩次 executemany 一次寫完；
+        # 資料已由 parse_stock_data 驗證過，不再逐檔建立 DataFrame
+        price_rows = [
+            (stock['symbol'], date_str, stock['close_price'])
+            for stock in data
+        ]
+        # 只為尚未入清單的股票準備 upsert，其餘直接略過
+        list_items = [
+            (stock['symbol'], stock['name'])
+            for stock in data
+            if stock['symbol'] not in self._stocks_seen
+        ]
+
+        # 資料已在解析層驗證，這裡若再出錯是資料庫本身的結構性問題，
+        # 讓例外直接浮現而不是吞掉後繼續跑整個回補
+        self.db.insert_stock_prices_bulk(price_rows, source='TPEX')
+        self.db.add_stocks_to_list_bulk(list_items, market='TPEX')
+        self._stocks_seen.update(symbol for symbol, _ in list_items)
+
+        return len(price_rows)
 
     def update_date_range(
         self,
         start_date: datetime,
         end_date: datetime,
-        delay: float = 1.0
+        delay: float = 1.0,
+        max_workers: int = 8
     ) -> Dict[str, int]:
         """
-        更新日期範圍內的櫃買股票資料
+        更新日期範圍內的櫃買股票資料（抓取並行、寫入序列化）
+
+        抓取與解析彼此獨立，交給執行緒池同時處理多個日期；
+        executor.map 依提交順序產出結果，主執行緒像消費者一樣
+        逐日把解析完的資料批次寫入資料庫，單一連線即可
 
         Args:
             start_date: 起始日期
             end_date: 結束日期
-            delay: 每次請求間的延遲（秒）
+            delay: 舊參數，保留相容；請求壓力改由 max_workers 控制
+            max_workers: 同時抓取的日期數
 
         Returns:
             {日期: 更新數量} 的字典
         """
-        results = {}
+        # 先一次建好（日期, 日期字串）列表：週六日在此過濾，
+        # 迴圈內也不再重複呼叫 strftime
+        dates = []
         current_date = start_date
-
         while current_date <= end_date:
-            date_str = current_date.strftime('%Y-%m-%d')
+            if current_date.weekday() < 5:
+                dates.append((current_date, current_date.strftime('%Y-%m-%d')))
+            current_date += timedelta(days=1)
 
-            count = self.update_single_date(current_date)
-            results[date_str] = count
+        results = {}
 
-            # 延遲
-            if delay > 0 and current_date < end_date:
-                import time
-                time.sleep(delay)
+        # 回補期間免去逐日 commit 的 fsync，中斷重跑即可補回
+        with self.db.bulk_mode(), ThreadPoolExecutor(max_workers=max_workers) as executor:
+            fetched = executor.map(
+                self.fetcher.fetch_and_parse, [date for date, _ in dates]
+            )
 
-            current_date += timedelta(days=1)
+            for (date, date_str), data in zip(dates, fetched):
+                count = self._store_parsed_data(date_str, data)
+                results[date_str] = count
+                # 每個日期彙總成一行，不在內層逐檔輸出
+                logger.info("%s: 更新 %d 檔股票", date_str, count)
 
         return results
 
@@ -121,19 +148,25 @@ class TPEXUpdater:
         end_date = datetime.now()
         start_date = end_date - timedelta(days=days)
 
-        print(f"\n開始更新最近 {days} 天的櫃買中心資料")
-        print(f"時間範圍: {start_date.strftime('%Y-%m-%d')} 至 {end_date.strftime('%Y-%m-%d')}")
+        logger.info("開始更新最近 %d 天的櫃買中心資料", days)
+        logger.info(
+            "時間範圍: %s 至 %s",
+            start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+        )
 
         results = self.update_date_range(start_date, end_date, delay)
 
         total = sum(results.values())
-        print(f"\n更新完成！總共更新 {total} 筆資料")
+        logger.info("更新完成！總共更新 %d 筆資料", total)
 
         return total
 
 
 def main():
     """測試用主程式"""
+    # 互動執行時顯示進度訊息
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
     # 初始化資料庫
     db = StockDatabase()
 